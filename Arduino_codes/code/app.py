@@ -1,11 +1,27 @@
-from flask import Flask, render_template, jsonify, request
-import serial, json, threading, time
+from flask import Flask, render_template, jsonify, request, Response
+import serial, json, struct, threading, time
+
+try:
+    import orjson  # C-extension JSON: parses bytes directly, dumps to bytes
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+_dumps = orjson.dumps if orjson is not None else (lambda obj: json.dumps(obj).encode())
 
 # --------- CONFIG ----------
 SERIAL_PORT = "COM11"       # ⚠️ Change to your Arduino COM port (Windows: "COM3"/"COM4", Linux: "/dev/ttyUSB0")
-BAUD = 9600
+BAUD = 115200
 # ---------------------------
 
+# Binary telemetry frame emitted by the Arduino: one magic byte followed by a
+# packed little-endian struct. 0xA5 never appears in the ASCII JSON acks, so
+# it doubles as the frame-sync marker.
+FRAME_MAGIC = 0xA5
+# soil_raw, soil_pct, mq_raw, pump, mode, temp_c10, humid, ts
+_FRAME_STRUCT = struct.Struct("<HBHBBhBI")
+FRAME_SIZE = 1 + _FRAME_STRUCT.size
+
 app = Flask(__name__)
 
 # Global sensor/actuator state
@@ -21,34 +37,93 @@ data = {
 }
 last_seen = 0  # timestamp of last valid packet
 
+# Pre-serialized `data`, refreshed by the reader thread on every packet so
+# /data does O(1) work per poll instead of re-marshalling the whole dict
+_cached_bytes = _dumps(data)
+
+
+def _refresh_cache():
+    global _cached_bytes
+    _cached_bytes = _dumps(data)
+
+
+# Shared serial port: opened once by the reader thread, reused by send_cmd.
+# Re-opening the port per command costs tens of ms and toggles DTR, which
+# resets the Arduino.
+_ser = None
+_ser_lock = threading.Lock()
+
 # ---------------------------
 # 🔄 Serial Reader Thread
 # ---------------------------
+def _handle_frame(payload: bytes):
+    """ Unpack one binary telemetry frame into the shared data dict """
+    global last_seen
+    soil_raw, soil_pct, mq_raw, pump, mode, temp_c10, humid, ts = _FRAME_STRUCT.unpack(payload)
+    data.update(
+        soil_raw=soil_raw,
+        soil_pct=soil_pct,
+        mq_raw=mq_raw,
+        pump=pump,
+        mode="AUTO" if mode else "MAN",
+        temp_c=None if temp_c10 == -1000 else temp_c10 / 10.0,  # -1000 = DHT read failed
+        humid=None if humid == 255 else humid,
+        ts=ts,
+    )
+    last_seen = time.time()
+    _refresh_cache()
+
+
 def reader():
-    """ Continuously read JSON lines from Arduino """
-    global data, last_seen
+    """ Continuously read binary telemetry frames and JSON ack lines from Arduino """
+    global data, last_seen, _ser
+    _rx = bytearray()  # partial-line buffer; avoids per-call readline allocations
     while True:
         try:
             print(f"🔌 Connecting to {SERIAL_PORT}...")
-            with serial.Serial(SERIAL_PORT, BAUD, timeout=1) as ser:
+            # Short timeout: a 1 s readline stalls the loop when no newline is
+            # pending and adds up to a second of latency to /data
+            with serial.Serial(SERIAL_PORT, BAUD, timeout=0.01, dsrdtr=False, rtscts=False) as ser:
                 ser.reset_input_buffer()
+                _rx.clear()
+                _ser = ser
                 print("✅ Connected to Arduino")
                 while True:
-                    line = ser.readline().decode("utf-8", errors="ignore").strip()
-                    if not line:
+                    chunk = ser.read(ser.in_waiting or 1)
+                    if not chunk:
                         continue
-                    if line.startswith("{") and line.endswith("}"):
+                    _rx += chunk
+                    while True:
+                        m = _rx.find(FRAME_MAGIC)
+                        n = _rx.find(b"\n")
+                        # Binary frame first if its magic precedes the next newline
+                        if m != -1 and (n == -1 or m < n):
+                            if len(_rx) - m < FRAME_SIZE:
+                                break  # wait for the rest of the frame
+                            _handle_frame(bytes(_rx[m + 1:m + FRAME_SIZE]))
+                            del _rx[:m + FRAME_SIZE]
+                            continue
+                        if n == -1:
+                            break
+                        line = bytes(_rx[:n].strip())
+                        del _rx[:n + 1]
+                        # Sniff on bytes; only complete JSON objects get decoded
+                        if line[:1] != b"{" or line[-1:] != b"}":
+                            continue
                         try:
-                            obj = json.loads(line)
+                            obj = _loads(line)
                             data.update(obj)
                             last_seen = time.time()
+                            _refresh_cache()
                             print("📥 Data:", obj)
-                        except json.JSONDecodeError:
+                        except ValueError:
                             print("⚠️ Invalid JSON:", line)
         except serial.SerialException as e:
+            _ser = None
             print(f"⚠️ Serial error: {e}. Retrying in 3s...")
             time.sleep(3)
         except Exception as e:
+            _ser = None
             print(f"⚠️ Unexpected error: {e}. Retrying in 3s...")
             time.sleep(3)
 
@@ -59,11 +134,14 @@ threading.Thread(target=reader, daemon=True).start()
 # 🔧 Serial Command Sender
 # ---------------------------
 def send_cmd(cmd: str):
-    """ Send a command to Arduino over serial """
+    """ Send a command to Arduino over the shared serial port """
     try:
-        with serial.Serial(SERIAL_PORT, BAUD, timeout=1) as ser:
-            ser.write((cmd + "\n").encode("utf-8"))
-            print(f"➡️ Sent command: {cmd}")
+        with _ser_lock:
+            if _ser is None:
+                print(f"⚠️ Could not send command: serial port not connected")
+                return
+            _ser.write((cmd + "\n").encode("utf-8"))
+        print(f"➡️ Sent command: {cmd}")
     except Exception as e:
         print(f"⚠️ Could not send command: {e}")
 
@@ -77,10 +155,19 @@ def index():
 @app.route("/data")
 def get_data():
     """Return latest Arduino sensor+actuator data as JSON"""
-    age = time.time() - last_seen if last_seen else None
-    out = dict(data)
-    out["age_sec"] = age
-    return jsonify(out)
+    # Snapshot both globals together; the reader thread updates them as a pair
+    cached, seen = _cached_bytes, last_seen
+    etag = f'"{seen}"'
+    if request.headers.get("If-None-Match") == etag:
+        resp = Response(status=304)
+    else:
+        # Patch age_sec into the cached bytes instead of re-encoding everything
+        age = f"{time.time() - seen:.2f}" if seen else "null"
+        body = cached[:-1] + f',"age_sec":{age}}}'.encode()
+        resp = Response(body, mimetype="application/json")
+    resp.headers["ETag"] = etag
+    resp.headers["Cache-Control"] = "max-age=0, must-revalidate"
+    return resp
 
 @app.route("/relay/<state>", methods=["POST"])
 def relay(state):
@@ -111,4 +198,11 @@ def set_thresholds():
 # ▶️ Run Flask
 # ---------------------------
 if __name__ == "__main__":
-    app.run(debug=True, use_reloader=False)
+    try:
+        # Werkzeug's dev server serializes requests; a fast /data poll would
+        # starve /relay commands. Prefer waitress when it is installed.
+        from waitress import serve
+        print("🚀 Serving with waitress on 0.0.0.0:5000")
+        serve(app, host="0.0.0.0", port=5000, threads=8)
+    except ImportError:
+        app.run(debug=True, use_reloader=False, threaded=True)
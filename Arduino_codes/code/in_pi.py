@@ -1,7 +1,23 @@
+import os
 import RPi.GPIO as GPIO
 import time
 import requests
 
+try:
+    import orjson  # C-extension JSON: parses response bytes directly
+except ImportError:
+    orjson = None
+
+# Reduce pump-pulse timing jitter from CFS preemption; needs root or
+# CAP_SYS_NICE, otherwise run with default scheduling
+try:
+    os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(50))
+except (AttributeError, PermissionError, OSError):
+    try:
+        os.nice(-20)
+    except (PermissionError, OSError):
+        pass
+
 # GPIO setup
 RELAY_PIN = 17  # GPIO17
 
@@ -12,11 +28,17 @@ GPIO.output(RELAY_PIN, GPIO.HIGH)  # Relay off (assuming active LOW)
 # API endpoint (replace with your actual API URL)
 API_URL = "https://api.plant.id/v3/health_assessment"
 
+# One keep-alive session for the lifetime of the loop; requests.get() would
+# otherwise do a fresh TCP+TLS handshake on every 60 s poll
+SESSION = requests.Session()
+SESSION.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1))
+SESSION.headers["Connection"] = "keep-alive"
+
 def get_plant_health():
     try:
-        response = requests.get(API_URL, timeout=5)
+        response = SESSION.get(API_URL, timeout=5)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content) if orjson is not None else response.json()
         # Assuming API returns JSON like {"health": "Healthy"} or {"health": "Infected"}
         return data.get("health", "Unknown")
     except Exception as e:
@@ -31,6 +53,10 @@ def activate_pump(duration=10):
     print("Pump deactivated.")
 
 def main():
+    # Anchor each iteration to monotonic time so API latency (or a long
+    # pump run) doesn't push every later poll back; sleep(60) after the
+    # work would drift by the iteration's duration each cycle
+    next_tick = time.monotonic()
     while True:
         health_status = get_plant_health()
         print(f"Plant health status: {health_status}")
@@ -38,7 +64,13 @@ def main():
             activate_pump(duration=10)  # Pump on for 10 seconds
         else:
             print("Plant is healthy. Pump remains off.")
-        time.sleep(60)  # Check every 60 seconds
+        next_tick += 60.0  # Check every 60 seconds
+        sleep_for = next_tick - time.monotonic()
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+        else:
+            # Iteration overran the interval; resync instead of compounding
+            next_tick = time.monotonic()
 
 if __name__ == "__main__":
     try:
@@ -1,21 +1,63 @@
 import os
+import threading
 import time
-from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 from flask import current_app
-from PIL import Image, ImageDraw, ImageFont
+
+# Import cv2 and numpy independently: a Pi with picamera2 but no OpenCV
+# still has numpy, and the simplejpeg encode path only needs numpy
+try:
+    import cv2  # type: ignore
+except ImportError:
+    cv2 = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import simplejpeg  # type: ignore
+except ImportError:
+    simplejpeg = None
+
+
+def encode_jpeg(frame_bgr, quality: int = 85) -> bytes:
+    """Encode a BGR frame to JPEG bytes, preferring simplejpeg's turbo path.
+
+    Raises RuntimeError when neither encoder is importable so callers can
+    fall back (e.g. to PIL) instead of hitting an AttributeError on None.
+    """
+    if simplejpeg is not None and np is not None:
+        return simplejpeg.encode_jpeg(np.ascontiguousarray(frame_bgr), quality=quality, colorspace="BGR")
+    if cv2 is not None:
+        ok, buf = cv2.imencode(".jpg", frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG encode failed")
+        return buf.tobytes()
+    raise RuntimeError("No JPEG encoder available (install simplejpeg or opencv-python)")
+
+# Reused background for mock captures; copied per call instead of reallocating
+_MOCK_BG = np.full((480, 640, 3), (60, 120, 60), dtype=np.uint8) if np is not None else None
 
 
 class CameraService:
     def __init__(self, source: str) -> None:
         self.source = source
+        # Snapshot once; capture_image runs per request and should not go
+        # through the current_app config proxy every time
+        self.image_dir = current_app.config["IMAGE_DIR"]
         self._picam2 = None
         self._cv2 = None
         if source == "picamera2":
             try:
                 from picamera2 import Picamera2  # type: ignore
                 self._picam2 = Picamera2()
-                self._picam2.configure(self._picam2.create_still_configuration())
+                # BGR888 keeps frames in OpenCV's native order so the JPEG
+                # encode below needs no colorspace conversion
+                self._picam2.configure(
+                    self._picam2.create_still_configuration(main={"format": "BGR888", "size": (640, 480)})
+                )
                 self._picam2.start()
                 time.sleep(0.5)
             except Exception as exc:
@@ -30,35 +72,62 @@ class CameraService:
             except Exception:
                 self.source = "mock"
 
-    def capture_image(self) -> str:
-        image_dir = current_app.config["IMAGE_DIR"]
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_path = os.path.join(image_dir, f"capture_{ts}.jpg")
+    def capture_image(self) -> Tuple[str, Optional[bytes]]:
+        """Capture one frame; returns (file_path, jpeg_bytes).
 
-        if self.source == "picamera2" and self._picam2 is not None:
-            self._picam2.capture_file(file_path)
-            return file_path
+        The JPEG bytes are the same data written to disk, so callers can
+        feed them straight into detection without re-reading the file.
+        """
+        # time.strftime is a single C call; no datetime object per capture
+        ts = time.strftime("%Y%m%d_%H%M%S")
+        file_path = f"{self.image_dir}{os.sep}capture_{ts}.jpg"
 
-        if self.source == "opencv" and self._cv2 is not None:
-            ret, frame = self._cap.read()
+        frame = None
+        if self.source == "picamera2" and self._picam2 is not None:
+            frame = self._picam2.capture_array("main")
+        elif self.source == "opencv" and self._cv2 is not None:
+            ret, grabbed = self._cap.read()
             if ret:
-                self._cv2.imwrite(file_path, frame)
-                return file_path
+                frame = grabbed
+
+        if frame is None and cv2 is not None:
+            # Mock image
+            frame = _MOCK_BG.copy()
+            cv2.putText(frame, "Mock Leaf", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+            cv2.putText(frame, ts, (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+        if frame is not None:
+            try:
+                jpeg_bytes = encode_jpeg(frame)
+            except RuntimeError:
+                # picamera2 without OpenCV/simplejpeg: save the real frame
+                # through PIL instead of dropping it (BGR -> RGB)
+                from PIL import Image
+                Image.fromarray(frame[:, :, ::-1]).save(file_path, format="JPEG", quality=90)
+                return file_path, None
+            with open(file_path, "wb") as f:
+                f.write(jpeg_bytes)
+            return file_path, jpeg_bytes
 
-        # Mock image
+        # Fallback when OpenCV is unavailable
+        from PIL import Image, ImageDraw
         img = Image.new("RGB", (640, 480), color=(60, 120, 60))
         draw = ImageDraw.Draw(img)
         text = f"Mock Leaf\n{ts}"
         draw.text((20, 20), text, fill=(255, 255, 255))
         img.save(file_path, format="JPEG", quality=90)
-        return file_path
+        return file_path, None
 
 
 _camera_instance: Optional[CameraService] = None
+_camera_lock = threading.Lock()
 
 
 def get_camera() -> CameraService:
     global _camera_instance
     if _camera_instance is None:
-        _camera_instance = CameraService(current_app.config["CAMERA_SOURCE"])
+        # Guard init: Flask's threaded server can race two first captures
+        with _camera_lock:
+            if _camera_instance is None:
+                _camera_instance = CameraService(current_app.config["CAMERA_SOURCE"])
     return _camera_instance 
\ No newline at end of file
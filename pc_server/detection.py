@@ -1,18 +1,66 @@
 import json
 import random
-from typing import Dict, Tuple
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 from flask import current_app
 import requests
+from requests.adapters import HTTPAdapter
 
+# Reused session keeps the TCP/TLS connection to plant.id alive between calls
+_PLANTID_SESSION = requests.Session()
+_PLANTID_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
 
-def detect_disease(image_path: str) -> Tuple[str, float, Dict]:
+try:
+    import google.generativeai as genai  # type: ignore
+except ImportError:
+    genai = None
+
+try:
+    import cv2  # type: ignore
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+
+# Gemini rescales internally anyway; shrinking the upload saves bytes
+_GEMINI_MAX_EDGE = 512
+
+
+def _shrink_for_upload(image_bytes: bytes) -> bytes:
+    """Downscale a JPEG to <=512px max edge at quality 75 for upload."""
+    if cv2 is None:
+        return image_bytes
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return image_bytes
+    h, w = img.shape[:2]
+    scale = _GEMINI_MAX_EDGE / max(h, w)
+    if scale >= 1.0:
+        return image_bytes
+    small = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, 75])
+    return buf.tobytes() if ok else image_bytes
+
+try:
+    import orjson  # type: ignore
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+def detect_disease(image_path: str, image_bytes: Optional[bytes] = None) -> Tuple[str, float, Dict]:
+    """Detect disease for a captured image.
+
+    When the caller already holds the encoded JPEG (capture_image returns
+    it), pass image_bytes to skip re-reading the file from disk.
+    """
     backend = current_app.config["DETECTION_BACKEND"]
     if backend == "plantid":
         return _detect_with_plantid(image_path)
     elif backend == "tflite":
         return _detect_with_tflite(image_path)
     elif backend == "gemini":
-        return _detect_with_gemini(image_path)
+        return _detect_with_gemini(image_path, image_bytes)
     else:
         return _detect_mock(image_path)
 
@@ -30,11 +78,13 @@ def _detect_with_plantid(image_path: str) -> Tuple[str, float, Dict]:
     if not api_key:
         return _detect_mock(image_path)
     url = "https://api.plant.id/v3/health_assessment"
-    files = {"images": open(image_path, "rb")}
     payload = {"similar_images": False}
     headers = {"Api-Key": api_key}
     try:
-        resp = requests.post(url, headers=headers, files=files, data={"data": json.dumps(payload)}, timeout=30)
+        with open(image_path, "rb") as fp:
+            resp = _PLANTID_SESSION.post(
+                url, headers=headers, files={"images": fp}, data={"data": json.dumps(payload)}, timeout=30
+            )
         resp.raise_for_status()
         result = resp.json()
         # Simplify mapping; adapt as per actual API response structure
@@ -50,22 +100,29 @@ def _detect_with_tflite(image_path: str) -> Tuple[str, float, Dict]:
     return _detect_mock(image_path)
 
 
-def _detect_with_gemini(image_path: str) -> Tuple[str, float, Dict]:
+@lru_cache(maxsize=4)
+def _get_gemini_model(api_key: str, model_name: str):
+    """Build a GenerativeModel once per (key, model); setup is not free."""
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def _detect_with_gemini(image_path: str, image_bytes: Optional[bytes] = None) -> Tuple[str, float, Dict]:
     api_key = current_app.config.get("GEMINI_API_KEY", "")
     model_name = current_app.config.get("GEMINI_MODEL", "gemini-1.5-pro")
-    if not api_key:
+    if not api_key or genai is None:
         return _detect_mock(image_path)
     try:
-        import google.generativeai as genai  # type: ignore
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name)
+        model = _get_gemini_model(api_key, model_name)
         prompt = (
             "You are an agricultural plant disease assistant. Given a plant leaf image, "
             "respond with a compact JSON object with keys 'disease' (string) and 'severity' (number 0-100). "
             "If healthy, set disease='healthy' and severity=0."
         )
-        with open(image_path, "rb") as f:
-            image_bytes = f.read()
+        if image_bytes is None:
+            with open(image_path, "rb") as f:
+                image_bytes = f.read()
+        image_bytes = _shrink_for_upload(image_bytes)
         result = model.generate_content([
             {"mime_type": "image/jpeg", "data": image_bytes},
             prompt,
@@ -75,7 +132,7 @@ def _detect_with_gemini(image_path: str) -> Tuple[str, float, Dict]:
         start = text.find("{")
         end = text.rfind("}")
         if start != -1 and end != -1 and end > start:
-            parsed = json.loads(text[start:end+1])
+            parsed = _loads(text[start:end+1])
             disease = str(parsed.get("disease", "unknown"))
             sev = parsed.get("severity", 0)
             try:
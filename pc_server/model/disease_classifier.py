@@ -4,6 +4,20 @@ from typing import Dict, Any, Optional
 import json
 import time
 
+
+def quantize_onnx_model(model_path: str, output_path: Optional[str] = None) -> str:
+    """One-off dynamic int8 quantization of an ONNX model for CPU boxes.
+
+    Run offline; DiseaseClassifier automatically prefers the resulting
+    <name>.int8.onnx file when no GPU provider is available.
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    output_path = output_path or model_path.replace('.onnx', '.int8.onnx')
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QUInt8)
+    return output_path
+
+
 class DiseaseClassifier:
     """
     Plant disease classification using various ML backends
@@ -14,9 +28,28 @@ class DiseaseClassifier:
         self.model = None
         self.model_info = {}
         self.backend = "mock"  # Default to mock for testing
-        
+        self._input_buf = None  # Preallocated (1,H,W,C) buffer, set by loaders
+
         # Try to load different model types
         self._load_model()
+
+    def _alloc_input_buf(self, shape, dtype):
+        """Preallocate the batched input buffer when the shape is concrete."""
+        dims = [int(d) if d is not None and not isinstance(d, str) else 0 for d in shape]
+        if dims and dims[0] in (0, 1) and all(d > 0 for d in dims[1:]):
+            dims[0] = 1
+            self._input_buf = np.empty(dims, dtype=dtype)
+
+    def _as_batch(self, image: np.ndarray, dtype) -> np.ndarray:
+        """Copy into the reusable input buffer instead of expand_dims+astype."""
+        if self._input_buf is not None and image.shape == self._input_buf.shape[1:]:
+            np.copyto(self._input_buf[0], image, casting='unsafe')
+            return self._input_buf
+        if len(image.shape) == 3:
+            image = np.expand_dims(image, axis=0)
+        if image.dtype != dtype:
+            image = image.astype(dtype)
+        return image
     
     def _load_model(self):
         """Attempt to load the ML model from various backends"""
@@ -49,6 +82,7 @@ class DiseaseClassifier:
             import tensorflow as tf
             if os.path.exists(self.model_path) and self.model_path.endswith('.h5'):
                 self.model = tf.keras.models.load_model(self.model_path)
+                self._alloc_input_buf(self.model.input_shape, np.float32)
                 self.model_info = {
                     "backend": "tensorflow",
                     "model_type": "keras",
@@ -69,10 +103,30 @@ class DiseaseClassifier:
         try:
             import onnxruntime as ort
             if os.path.exists(self.model_path) and self.model_path.endswith('.onnx'):
-                self.model = ort.InferenceSession(self.model_path)
+                model_file = self.model_path
+                # On CPU-only boxes prefer an int8 sibling produced by
+                # quantize_onnx_model() when one exists
+                if 'CUDAExecutionProvider' not in ort.get_available_providers():
+                    int8_path = self.model_path.replace('.onnx', '.int8.onnx')
+                    if os.path.exists(int8_path):
+                        model_file = int8_path
+
+                sess_options = ort.SessionOptions()
+                sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                self.model = ort.InferenceSession(
+                    model_file,
+                    sess_options,
+                    providers=['CUDAExecutionProvider', 'CPUExecutionProvider']
+                )
+                # Input name/dtype are constant after load; avoid per-predict lookups
+                model_input = self.model.get_inputs()[0]
+                self._onnx_input_name = model_input.name
+                self._onnx_input_dtype = np.float16 if model_input.type == 'tensor(float16)' else np.float32
+                self._alloc_input_buf(model_input.shape, self._onnx_input_dtype)
                 self.model_info = {
                     "backend": "onnx",
                     "model_type": "onnx",
+                    "model_file": model_file,
                     "providers": self.model.get_providers()
                 }
                 print("✅ ONNX model loaded successfully")
@@ -91,11 +145,24 @@ class DiseaseClassifier:
                 interpreter = tf.lite.Interpreter(model_path=self.model_path)
                 interpreter.allocate_tensors()
                 self.model = interpreter
+                # Tensor indices and dtype are fixed after allocate_tensors();
+                # cache them so predict skips the detail-dict lookups
+                input_details = interpreter.get_input_details()
+                output_details = interpreter.get_output_details()
+                self._in_idx = input_details[0]['index']
+                self._out_idx = output_details[0]['index']
+                self._input_dtype = input_details[0]['dtype']
+                self._alloc_input_buf(input_details[0]['shape'], self._input_dtype)
+                # Keep only small JSON-serializable facts; the raw detail dicts
+                # hold numpy arrays and quantization params that bloat
+                # get_model_info() responses and pin tensor buffers
                 self.model_info = {
                     "backend": "tflite",
                     "model_type": "tflite",
-                    "input_details": interpreter.get_input_details(),
-                    "output_details": interpreter.get_output_details()
+                    "input_shape": tuple(int(d) for d in input_details[0]['shape']),
+                    "input_dtype": str(np.dtype(self._input_dtype)),
+                    "output_shape": tuple(int(d) for d in output_details[0]['shape']),
+                    "output_dtype": str(np.dtype(output_details[0]['dtype']))
                 }
                 print("✅ TFLite model loaded successfully")
                 return True
@@ -142,102 +209,102 @@ class DiseaseClassifier:
             print(f"Prediction error: {e}")
             return self._mock_predict()
     
+    def predict_batch(self, images: np.ndarray) -> list:
+        """
+        Predict diseases for a batch of preprocessed images
+
+        Args:
+            images: Stacked image array of shape (N, H, W, C)
+
+        Returns:
+            List of prediction result dicts, one per image
+        """
+        if self.backend == "mock":
+            return [self._mock_predict() for _ in range(len(images))]
+
+        try:
+            if self.backend == "tensorflow":
+                preds = self.model.predict(images, batch_size=len(images), verbose=0)
+            elif self.backend == "onnx":
+                preds = self.model.run(None, {self._onnx_input_name: images.astype(self._onnx_input_dtype)})[0]
+            elif self.backend == "tflite":
+                # TFLite interpreters are allocated for batch=1; run per image
+                return [self._tflite_predict(img) for img in images]
+            else:
+                return [self._mock_predict() for _ in range(len(images))]
+            return [self._postprocess(p, self.backend) for p in preds]
+
+        except Exception as e:
+            print(f"Batch prediction error: {e}")
+            return [self._mock_predict() for _ in range(len(images))]
+
+    # Class index to disease name mapping (customize based on your model)
+    DISEASE_CLASSES = ["healthy", "blight", "rust", "mildew", "leaf_spot"]
+
+    def _postprocess(self, preds: np.ndarray, backend: str) -> Dict[str, Any]:
+        """Decode a 1-D probability vector into the prediction result dict"""
+        class_idx = int(preds.argmax())
+        confidence = float(preds[class_idx])
+        classes = self.DISEASE_CLASSES
+        disease_class = classes[class_idx] if class_idx < len(classes) else f"class_{class_idx}"
+
+        return {
+            "class": disease_class,
+            "confidence": confidence,
+            "all_probabilities": preds.tolist(),
+            "backend": backend
+        }
+
     def _tensorflow_predict(self, image: np.ndarray) -> Dict[str, Any]:
         """TensorFlow/Keras prediction"""
         # Ensure image has correct shape and batch dimension
-        if len(image.shape) == 3:
-            image = np.expand_dims(image, axis=0)
-        
+        image = self._as_batch(image, np.float32)
+
         # Run prediction
         predictions = self.model.predict(image, verbose=0)
-        
-        # Get class with highest probability
-        class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][class_idx])
-        
-        # Map class index to disease names (customize based on your model)
-        disease_classes = ["healthy", "blight", "rust", "mildew", "leaf_spot"]
-        disease_class = disease_classes[class_idx] if class_idx < len(disease_classes) else f"class_{class_idx}"
-        
-        return {
-            "class": disease_class,
-            "confidence": confidence,
-            "all_probabilities": predictions[0].tolist(),
-            "backend": "tensorflow"
-        }
+
+        return self._postprocess(predictions[0], "tensorflow")
     
     def _onnx_predict(self, image: np.ndarray) -> Dict[str, Any]:
         """ONNX prediction"""
-        # Get input name
-        input_name = self.model.get_inputs()[0].name
-        
         # Ensure image has correct shape
-        if len(image.shape) == 3:
-            image = np.expand_dims(image, axis=0)
-        
+        image = self._as_batch(image, self._onnx_input_dtype)
+
         # Run prediction
-        predictions = self.model.run(None, {input_name: image.astype(np.float32)})[0]
-        
-        # Get class with highest probability
-        class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][class_idx])
-        
-        # Map class index to disease names
-        disease_classes = ["healthy", "blight", "rust", "mildew", "leaf_spot"]
-        disease_class = disease_classes[class_idx] if class_idx < len(disease_classes) else f"class_{class_idx}"
-        
-        return {
-            "class": disease_class,
-            "confidence": confidence,
-            "all_probabilities": predictions[0].tolist(),
-            "backend": "onnx"
-        }
+        predictions = self.model.run(None, {self._onnx_input_name: image})[0]
+
+        return self._postprocess(predictions[0], "onnx")
     
     def _tflite_predict(self, image: np.ndarray) -> Dict[str, Any]:
         """TFLite prediction"""
         interpreter = self.model
-        
-        # Get input and output details
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        
+
         # Ensure image has correct shape and type
-        if len(image.shape) == 3:
-            image = np.expand_dims(image, axis=0)
-        
-        # Set input tensor
-        interpreter.set_tensor(input_details[0]['index'], image.astype(np.float32))
-        
+        image = self._as_batch(image, self._input_dtype)
+
+        # Set input tensor (indices cached at load time)
+        interpreter.set_tensor(self._in_idx, image)
+
         # Run inference
         interpreter.invoke()
-        
+
         # Get output
-        predictions = interpreter.get_tensor(output_details[0]['index'])
-        
-        # Get class with highest probability
-        class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][class_idx])
-        
-        # Map class index to disease names
-        disease_classes = ["healthy", "blight", "rust", "mildew", "leaf_spot"]
-        disease_class = disease_classes[class_idx] if class_idx < len(disease_classes) else f"class_{class_idx}"
-        
-        return {
-            "class": disease_class,
-            "confidence": confidence,
-            "all_probabilities": predictions[0].tolist(),
-            "backend": "tflite"
-        }
+        predictions = interpreter.get_tensor(self._out_idx)
+
+        return self._postprocess(predictions[0], "tflite")
     
     def _mock_predict(self) -> Dict[str, Any]:
         """Mock prediction for testing"""
         import random
-        
-        # Simulate some delay
-        time.sleep(0.1)
+
+        # Optional simulated latency; the mock path also backs every error
+        # fallback, so it must be free by default
+        mock_latency_ms = os.environ.get("MOCK_LATENCY_MS")
+        if mock_latency_ms:
+            time.sleep(int(mock_latency_ms) / 1000.0)
         
         # Random disease classes
-        diseases = ["healthy", "blight", "rust", "mildew", "leaf_spot"]
+        diseases = self.DISEASE_CLASSES
         disease = random.choice(diseases)
         
         # Generate realistic confidence
@@ -1,17 +1,84 @@
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Tuple, Optional
 import os
 
+
+try:
+    # libjpeg-turbo decode is 2-4x faster than OpenCV's bundled libjpeg
+    from turbojpeg import TurboJPEG, TJPF_BGR  # type: ignore
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+try:
+    from numba import njit, prange  # type: ignore
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    # Shape-specialized replacement for the fancy-indexing gather in
+    # _normalize_image: one tight loop, parallel over rows, with the
+    # BGR->RGB swap folded into the lookup (2 - c)
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _lut_normalize_kernel(src, lut, out):  # pragma: no cover - jitted
+        height, width = src.shape[0], src.shape[1]
+        for y in prange(height):
+            for x in range(width):
+                for c in range(3):
+                    out[y, x, c] = lut[src[y, x, 2 - c], c]
+else:
+    _lut_normalize_kernel = None
+
+
+@lru_cache(maxsize=32)
+def _imread_cached(image_path: str, mtime_ns: int, size: int) -> Optional[np.ndarray]:
+    """Decode an image once per (path, mtime, size); pipeline stages that
+    load the same file repeatedly hit the cache instead of re-decoding."""
+    if _turbo is not None and image_path.lower().endswith(('.jpg', '.jpeg')):
+        try:
+            with open(image_path, 'rb') as f:
+                return _turbo.decode(f.read(), pixel_format=TJPF_BGR)
+        except Exception:
+            pass  # fall through to cv2.imread
+    return cv2.imread(image_path)
+
+
 class ImageProcessor:
     """
     Image preprocessing for plant disease detection
     """
     
-    def __init__(self, target_size: Tuple[int, int] = (224, 224)):
+    def __init__(self, target_size: Tuple[int, int] = (224, 224), out_dtype=np.float32):
         self.target_size = target_size
         self.mean = [0.485, 0.456, 0.406]  # ImageNet mean
         self.std = [0.229, 0.224, 0.225]   # ImageNet std
+        # float16 halves the bandwidth into the model when it accepts it;
+        # normalization is memory-bound so the win is near 2x for that stage
+        self.out_dtype = np.dtype(out_dtype)
+
+        # (x/255 - mean) / std folded into one multiply-add: x*scale + bias.
+        # Precomputed here so normalization walks the image buffer once.
+        mean_arr = np.array(self.mean, dtype=np.float32).reshape(1, 1, 3)
+        inv_std = (1.0 / np.array(self.std, dtype=np.float32)).reshape(1, 1, 3)
+        self._scale = (inv_std / 255.0).astype(self.out_dtype)
+        self._bias = (-mean_arr * inv_std).astype(self.out_dtype)
+        # Broadcastable copies for the inverse transform in save_preprocessed
+        self._mean_arr = mean_arr
+        self._std_arr = np.array(self.std, dtype=np.float32).reshape(1, 1, 3)
+
+        # uint8 fast path: only 256 distinct values exist per channel, so the
+        # whole normalization collapses to a (256,3) table lookup
+        levels = np.arange(256, dtype=np.float32).reshape(256, 1)
+        self._norm_lut = (levels * self._scale.reshape(1, 3) + self._bias.reshape(1, 3)).astype(self.out_dtype)
+        self._channel_idx = np.arange(3)
+
+        # Final preprocessed tensors keyed by file identity, so repeated
+        # detections on the same image skip the whole pipeline
+        self._preproc_cache = {}
     
     def preprocess(self, image_path: str) -> np.ndarray:
         """
@@ -23,35 +90,76 @@ class ImageProcessor:
         Returns:
             Preprocessed image array ready for model input
         """
+        try:
+            st = os.stat(image_path)
+            cache_key = (image_path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            cache_key = None
+
+        if cache_key is not None and cache_key in self._preproc_cache:
+            return self._preproc_cache[cache_key]
+
         # Load image
         image = self._load_image(image_path)
         if image is None:
             raise ValueError(f"Could not load image from {image_path}")
-        
+
         # Apply preprocessing pipeline
         image = self._resize_image(image)
         image = self._normalize_image(image)
         image = self._ensure_channels(image)
-        
+
+        if cache_key is not None:
+            if len(self._preproc_cache) >= 32:
+                self._preproc_cache.pop(next(iter(self._preproc_cache)))
+            self._preproc_cache[cache_key] = image
+
         return image
     
+    def preprocess_batch(self, image_paths: List[str]) -> np.ndarray:
+        """
+        Preprocess several images into one stacked batch
+
+        Args:
+            image_paths: Paths to the image files
+
+        Returns:
+            (N, H, W, 3) float32 array ready for DiseaseClassifier.predict_batch
+        """
+        # OpenCV releases the GIL during decode, so threads help this stage
+        with ThreadPoolExecutor(max_workers=min(4, max(len(image_paths), 1))) as pool:
+            images = list(pool.map(self._load_image, image_paths))
+
+        resized = []
+        for path, image in zip(image_paths, images):
+            if image is None:
+                raise ValueError(f"Could not load image from {path}")
+            resized.append(self._resize_image(image))
+
+        # One stacked normalize pass; the LUT gather broadcasts over N
+        return self._normalize_image(np.stack(resized))
+
     def _load_image(self, image_path: str) -> Optional[np.ndarray]:
-        """Load image from file path"""
+        """Load image from file path.
+
+        Returns the image in BGR order (OpenCV native); the BGR->RGB swap is
+        folded into _normalize_image so the hot path skips a full-image pass.
+        Display-oriented helpers convert to RGB at their own boundary.
+        """
         if not os.path.exists(image_path):
             print(f"Image file not found: {image_path}")
             return None
-        
+
         try:
-            # Load image in BGR format (OpenCV default)
-            image = cv2.imread(image_path)
+            # Load image in BGR format (OpenCV default), cached on file identity
+            st = os.stat(image_path)
+            image = _imread_cached(image_path, st.st_mtime_ns, st.st_size)
             if image is None:
                 print(f"Failed to load image: {image_path}")
                 return None
-            
-            # Convert BGR to RGB
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
             return image
-            
+
         except Exception as e:
             print(f"Error loading image {image_path}: {e}")
             return None
@@ -72,34 +180,45 @@ class ImageProcessor:
         new_width = int(width * scale)
         new_height = int(height * scale)
         
-        # Resize image
-        resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-        
-        # Create canvas with target size
-        canvas = np.zeros((self.target_size[1], self.target_size[0], 3), dtype=np.uint8)
-        
-        # Calculate position to center the image
-        x_offset = (self.target_size[0] - new_width) // 2
-        y_offset = (self.target_size[1] - new_height) // 2
-        
-        # Place resized image on canvas
-        canvas[y_offset:y_offset+new_height, x_offset:x_offset+new_width] = resized
-        
-        return canvas
+        # Resize image; INTER_AREA only pays off when downscaling
+        interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        resized = cv2.resize(image, (new_width, new_height), interpolation=interp)
+
+        # Letterbox to target size in one SIMD pass instead of zeroing a
+        # canvas and copying the resized image into a centered slice
+        top = (self.target_size[1] - new_height) // 2
+        bottom = self.target_size[1] - new_height - top
+        left = (self.target_size[0] - new_width) // 2
+        right = self.target_size[0] - new_width - left
+
+        return cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(0, 0, 0))
     
     def _normalize_image(self, image: np.ndarray) -> np.ndarray:
-        """Normalize image pixel values"""
-        # Convert to float32
-        image = image.astype(np.float32)
-        
-        # Normalize to [0, 1]
-        image = image / 255.0
-        
-        # Apply ImageNet normalization
-        for i in range(3):
-            image[:, :, i] = (image[:, :, i] - self.mean[i]) / self.std[i]
-        
-        return image
+        """Normalize image pixel values (scaled to [0,1] + ImageNet mean/std).
+
+        Input is BGR (as produced by _load_image); output is RGB-ordered.
+        The channel swap is a zero-copy reversed view, so the swap rides
+        along with the normalization pass for free.
+        """
+        if (_lut_normalize_kernel is not None and image.dtype == np.uint8
+                and image.ndim == 3 and self.out_dtype == np.float32):
+            out = np.empty(image.shape, dtype=np.float32)
+            _lut_normalize_kernel(image, self._norm_lut, out)
+            return out
+
+        image = image[..., ::-1]
+        if image.dtype == np.uint8:
+            # Pure gather through the precomputed table, no arithmetic
+            return self._norm_lut[image, self._channel_idx]
+
+        # Single fused multiply-add instead of a per-channel Python loop;
+        # both ops write into the one preallocated output buffer, so the
+        # float fallback allocates exactly once and never creates the
+        # broadcast temporaries that slice-assignment would
+        out = np.empty(image.shape, dtype=self.out_dtype)
+        np.multiply(image, self._scale, out=out, casting='unsafe')
+        np.add(out, self._bias, out=out)
+        return out
     
     def _ensure_channels(self, image: np.ndarray) -> np.ndarray:
         """Ensure image has correct number of channels"""
@@ -131,6 +250,9 @@ class ImageProcessor:
         if image is None:
             raise ValueError(f"Could not load image from {image_path}")
         
+        # Display helpers still hand out RGB
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
         # Resize for display (maintain aspect ratio)
         height, width = image.shape[:2]
         scale_x = max_size[0] / width
@@ -161,8 +283,11 @@ class ImageProcessor:
         if image is None:
             raise ValueError(f"Could not load image from {image_path}")
         
+        # Display helpers still hand out RGB
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
         height, width = image.shape[:2]
-        
+
         # Calculate region boundaries
         x1 = max(0, x - size // 2)
         y1 = max(0, y - size // 2)
@@ -171,9 +296,11 @@ class ImageProcessor:
         
         # Extract region
         region = image[y1:y2, x1:x2]
-        
-        # Resize to target size
-        region = cv2.resize(region, self.target_size, interpolation=cv2.INTER_AREA)
+
+        # Resize to target size; small regions get upscaled, so pick
+        # the interpolation accordingly
+        interp = cv2.INTER_AREA if (x2 - x1) > self.target_size[0] else cv2.INTER_LINEAR
+        region = cv2.resize(region, self.target_size, interpolation=interp)
         
         return region
     
@@ -187,23 +314,33 @@ class ImageProcessor:
         Returns:
             Augmented image array
         """
-        # Random horizontal flip
-        if np.random.random() > 0.5:
-            image = np.fliplr(image)
-        
-        # Random rotation (small angles)
-        if np.random.random() > 0.5:
+        height, width = image.shape[:2]
+        flip = np.random.random() > 0.5
+        rotate = np.random.random() > 0.5
+
+        # Flip-only case: a reversed view costs nothing; it is materialized
+        # at the output boundary below only if nothing else copies first
+        if flip and not rotate:
+            image = image[:, ::-1]
+        # Random flip + rotation fused into one affine pass
+        elif flip or rotate:
             angle = np.random.uniform(-15, 15)
-            height, width = image.shape[:2]
             center = (width // 2, height // 2)
             rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
-            image = cv2.warpAffine(image, rotation_matrix, (width, height))
-        
-        # Random brightness adjustment
+            if flip:
+                # Compose a horizontal mirror into the same matrix
+                rotation_matrix[0, :] = -rotation_matrix[0, :]
+                rotation_matrix[0, 2] += width - 1
+            image = cv2.warpAffine(image, rotation_matrix, (width, height), flags=cv2.INTER_LINEAR)
+
+        # Random brightness adjustment (SIMD saturate-cast, no float temporary)
         if np.random.random() > 0.5:
             factor = np.random.uniform(0.8, 1.2)
-            image = np.clip(image * factor, 0, 255).astype(np.uint8)
-        
+            image = cv2.convertScaleAbs(image, alpha=factor, beta=0)
+
+        if not image.flags['C_CONTIGUOUS']:
+            image = np.ascontiguousarray(image)
+
         return image
     
     def save_preprocessed(self, image: np.ndarray, output_path: str) -> bool:
@@ -219,15 +356,12 @@ class ImageProcessor:
         """
         try:
             # Denormalize if needed
-            if image.dtype == np.float32:
-                # Reverse ImageNet normalization
-                denorm_image = image.copy()
-                for i in range(3):
-                    denorm_image[:, :, i] = denorm_image[:, :, i] * self.std[i] + self.mean[i]
-                
-                # Clip to [0, 1] and convert to [0, 255]
-                denorm_image = np.clip(denorm_image, 0, 1)
-                denorm_image = (denorm_image * 255).astype(np.uint8)
+            if np.issubdtype(image.dtype, np.floating):
+                # Reverse ImageNet normalization in one broadcast pass
+                # instead of the old per-channel loop, then clip+round to
+                # uint8 in a single expression
+                denorm_image = image * self._std_arr + self._mean_arr
+                denorm_image = np.clip(denorm_image * 255.0 + 0.5, 0, 255).astype(np.uint8)
             else:
                 denorm_image = image
             
@@ -5,12 +5,17 @@ PC captures images, runs AI detection, makes decisions, and controls Pi
 """
 
 from flask import Flask, jsonify, render_template, request
+import collections
 import os
 import cv2
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import numpy as np
 
 # Import detection module
@@ -19,9 +24,10 @@ from detection import detect_disease
 # Create Flask app
 app = Flask(__name__, static_folder="static", template_folder="templates")
 
-# Global variables to store recent results
-recent_detections = []
-recent_actions = []
+# Global ring buffers of recent results; deque(maxlen=...) evicts the
+# oldest entry in O(1) instead of list.pop(0)'s O(n) shift
+recent_detections = collections.deque(maxlen=50)
+recent_actions = collections.deque(maxlen=50)
 
 # Configuration
 app.config.update(
@@ -37,18 +43,99 @@ app.config.update(
     PI_TIMEOUT=10,
 )
 
+# Snapshot hot-path settings once; every request read these through the
+# Flask config dict otherwise
+THRESH_LOW = app.config["SEVERITY_LOW_THRESHOLD"]
+THRESH_HIGH = app.config["SEVERITY_HIGH_THRESHOLD"]
+DUR_LOW = app.config["SPRAY_DURATION_LOW_MS"]
+DUR_HIGH = app.config["SPRAY_DURATION_HIGH_MS"]
+PI_API_URL = app.config["PI_API_URL"]
+PI_TIMEOUT = app.config["PI_TIMEOUT"]
+
+# Persistent keep-alive connection to the Pi; saves a TCP handshake and
+# socket churn on every command
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=2, max_retries=Retry(total=0)))
+
+# Pi commands run off the request thread: the detection response returns
+# immediately and /api/results shows the final Pi status on the next poll
+EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
 # Camera configuration
 camera = None
 is_camera_running = False
+# Guards open/close and the running flag; concurrent capture_and_detect +
+# /api/start_camera must not both open VideoCapture(0)
+camera_lock = threading.Lock()
+_grab_thread = None
+
+# Latest frame kept warm by a background grab loop, so detection requests
+# never pay the ~1/FPS V4L2 grab latency themselves
+latest_frame = None
+frame_lock = threading.Lock()
+
+def _grab_loop(cam):
+    """Continuously pull frames so capture_image() reads the cached latest"""
+    global latest_frame
+    while is_camera_running and camera is cam:
+        if cam.grab():
+            ret, frame = cam.retrieve()
+            if ret:
+                with frame_lock:
+                    latest_frame = frame
+        else:
+            time.sleep(0.05)
+
+def _init_camera():
+    """Open the camera, configure it, and start the keep-warm grab thread"""
+    global camera, is_camera_running, latest_frame, _grab_thread
+    with camera_lock:
+        if is_camera_running:
+            return True
+
+        cam = cv2.VideoCapture(0)  # Use default camera
+        if not cam.isOpened():
+            print("❌ Failed to open camera")
+            return False
+
+        # Set camera properties. MJPG keeps the USB transfer compressed so the
+        # camera isn't bandwidth-limited to low FPS like uncompressed YUYV;
+        # fourcc must be set before the resolution for V4L2 to honor it.
+        cam.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cam.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cam.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        cam.set(cv2.CAP_PROP_FPS, 15)
+        camera = cam
+        is_camera_running = True
+        latest_frame = None
+        _grab_thread = threading.Thread(target=_grab_loop, args=(cam,), daemon=True)
+        _grab_thread.start()
+        print("✅ Camera initialized")
+        return True
+
+def _stop_camera():
+    """Stop the grab thread, then release. cv2.VideoCapture isn't
+    thread-safe: release() must wait until no grab is in flight."""
+    global camera, is_camera_running, _grab_thread
+    with camera_lock:
+        cam = camera
+        thread = _grab_thread
+        is_camera_running = False
+        camera = None
+        _grab_thread = None
+    if thread is not None:
+        thread.join()
+    if cam is not None:
+        cam.release()
 
 @app.route('/')
 def index():
     return render_template(
         "index.html",
-        detections=recent_detections[-10:],  # Show last 10 detections
-        actions=recent_actions[-10:],        # Show last 10 actions
-        low=app.config["SEVERITY_LOW_THRESHOLD"],
-        high=app.config["SEVERITY_HIGH_THRESHOLD"],
+        detections=list(recent_detections)[-10:],  # Show last 10 detections
+        actions=list(recent_actions)[-10:],        # Show last 10 actions
+        low=THRESH_LOW,
+        high=THRESH_HIGH,
     )
 
 @app.route('/api/capture_and_detect', methods=['POST'])
@@ -60,37 +147,33 @@ def capture_and_detect():
         if image is None:
             return jsonify({"error": "Failed to capture image", "status": "error"}), 500
         
-        # Save image temporarily
         timestamp = int(time.time())
         filename = f"capture_{timestamp}.jpg"
-        filepath = os.path.join("temp", filename)
-        
-        # Create temp directory if it doesn't exist
-        os.makedirs("temp", exist_ok=True)
-        
-        # Save captured image
-        cv2.imwrite(filepath, image)
-        
+
+        # Encode in memory; no temp-file write/read/delete round-trip
+        jpeg_bytes = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+
         # Step 2: AI Disease Detection
-        disease, severity, data = detect_disease(filepath)
+        disease, severity, data = detect_disease(filename, image_bytes=jpeg_bytes)
         
         # Step 3: Decision Logic
-        if severity > app.config["SEVERITY_HIGH_THRESHOLD"]:
+        if severity > THRESH_HIGH:
             action = "on"
-            duration_ms = app.config["SPRAY_DURATION_HIGH_MS"]
+            duration_ms = DUR_HIGH
             result = "Diseased (High)"
-        elif severity > app.config["SEVERITY_LOW_THRESHOLD"]:
+        elif severity > THRESH_LOW:
             action = "on"
-            duration_ms = app.config["SPRAY_DURATION_LOW_MS"]
+            duration_ms = DUR_LOW
             result = "Diseased (Low)"
         else:
             action = "off"
             duration_ms = 0
             result = "Healthy"
         
-        # Step 4: Send Command to Pi
-        pi_response = send_command_to_pi(action, duration_ms)
-        
+        # Step 4: Send Command to Pi (in the background, up to PI_TIMEOUT)
+        pi_response = {"status": "pending"}
+        pi_future = EXECUTOR.submit(send_command_to_pi, action, duration_ms)
+
         # Step 5: Store Results
         detection_result = {
             "id": len(recent_detections) + 1,
@@ -113,21 +196,17 @@ def capture_and_detect():
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
+        # Patch the stored entries once the Pi round-trip completes
+        def _update_pi_status(future, det=detection_result, act=action_result):
+            resp = future.result()
+            det["pi_response"] = resp
+            act["pi_status"] = resp.get("status", "unknown")
+
+        pi_future.add_done_callback(_update_pi_status)
+
         recent_detections.append(detection_result)
         recent_actions.append(action_result)
-        
-        # Keep only last 50 results
-        if len(recent_detections) > 50:
-            recent_detections.pop(0)
-        if len(recent_actions) > 50:
-            recent_actions.pop(0)
-        
-        # Clean up temp file
-        try:
-            os.remove(filepath)
-        except:
-            pass
-        
+
         response_data = {
             "status": "success",
             "result": result,
@@ -142,7 +221,6 @@ def capture_and_detect():
         
         # Log the complete cycle
         print(f"🌱 Complete Cycle: {result} - Disease: {disease} - Severity: {severity}% - Action: {action} - Duration: {duration_ms}ms")
-        print(f"📡 Pi Response: {pi_response}")
         
         return jsonify(response_data)
         
@@ -155,31 +233,25 @@ def capture_and_detect():
 
 def capture_image():
     """Capture image from camera"""
-    global camera, is_camera_running
-    
     try:
         if not is_camera_running:
-            # Initialize camera
-            camera = cv2.VideoCapture(0)  # Use default camera
-            if not camera.isOpened():
-                print("❌ Failed to open camera")
+            if not _init_camera():
                 return None
-            
-            # Set camera properties
-            camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            camera.set(cv2.CAP_PROP_FPS, 15)
-            is_camera_running = True
-            print("✅ Camera initialized")
-        
-        # Capture frame
-        ret, frame = camera.read()
-        if not ret:
-            print("❌ Failed to capture frame")
-            return None
-        
-        return frame
-        
+
+        # Use the frame the grab loop already fetched; right after init,
+        # wait briefly for the first grab instead of read()ing the capture
+        # from a second thread (VideoCapture is not thread-safe)
+        deadline = time.monotonic() + 2.0
+        while True:
+            with frame_lock:
+                frame = latest_frame
+            if frame is not None:
+                return frame.copy()
+            if time.monotonic() >= deadline:
+                print("❌ Failed to capture frame")
+                return None
+            time.sleep(0.05)
+
     except Exception as e:
         print(f"❌ Camera error: {e}")
         return None
@@ -192,13 +264,14 @@ def send_command_to_pi(action, duration_ms):
             "duration": duration_ms
         }
         
-        response = requests.post(
-            app.config["PI_API_URL"],
+        response = SESSION.post(
+            PI_API_URL,
             json=payload,
-            timeout=app.config["PI_TIMEOUT"]
+            timeout=PI_TIMEOUT
         )
         
-        if response.status_code == 200:
+        # Pi answers 200 for "off" and 202 when a spray pulse was scheduled
+        if response.ok:
             return response.json()
         else:
             print(f"❌ Pi API error: {response.status_code} - {response.text}")
@@ -217,16 +290,9 @@ def send_command_to_pi(action, duration_ms):
 @app.route('/api/start_camera', methods=['POST'])
 def start_camera():
     """Start camera for continuous monitoring"""
-    global camera, is_camera_running
-    
     try:
         if not is_camera_running:
-            camera = cv2.VideoCapture(0)
-            if camera.isOpened():
-                camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                camera.set(cv2.CAP_PROP_FPS, 15)
-                is_camera_running = True
+            if _init_camera():
                 print("✅ Camera started")
                 return jsonify({"status": "success", "message": "Camera started"})
             else:
@@ -240,13 +306,9 @@ def start_camera():
 @app.route('/api/stop_camera', methods=['POST'])
 def stop_camera():
     """Stop camera"""
-    global camera, is_camera_running
-    
     try:
-        if camera and is_camera_running:
-            camera.release()
-            camera = None
-            is_camera_running = False
+        if is_camera_running:
+            _stop_camera()
             print("✅ Camera stopped")
             return jsonify({"status": "success", "message": "Camera stopped"})
         else:
@@ -264,15 +326,15 @@ def health_check():
         "camera_running": is_camera_running,
         "detections_count": len(recent_detections),
         "actions_count": len(recent_actions),
-        "pi_api_url": app.config["PI_API_URL"]
+        "pi_api_url": PI_API_URL
     })
 
 @app.route('/api/results', methods=['GET'])
 def get_results():
     """Get recent results for UI updates"""
     return jsonify({
-        "detections": recent_detections[-10:],
-        "actions": recent_actions[-10:],
+        "detections": list(recent_detections)[-10:],
+        "actions": list(recent_actions)[-10:],
         "total_detections": len(recent_detections),
         "total_actions": len(recent_actions)
     })
@@ -281,8 +343,8 @@ def get_results():
 def test_pi_connection():
     """Test connection to Raspberry Pi"""
     try:
-        response = requests.get(
-            app.config["PI_API_URL"].replace("/sprinkle", "/health"),
+        response = SESSION.get(
+            PI_API_URL.replace("/sprinkle", "/health"),
             timeout=5
         )
         
@@ -307,9 +369,9 @@ def test_pi_connection():
 if __name__ == '__main__':
     print("🌱 Plant Disease Detection & Sprinkler Control - PC Master Controller")
     print(f"Detection backend: Gemini API")
-    print(f"Severity thresholds: Low={app.config['SEVERITY_LOW_THRESHOLD']}%, High={app.config['SEVERITY_HIGH_THRESHOLD']}%")
-    print(f"Spray durations: Low={app.config['SPRAY_DURATION_LOW_MS']}ms, High={app.config['SPRAY_DURATION_HIGH_MS']}ms")
-    print(f"Pi API URL: {app.config['PI_API_URL']}")
+    print(f"Severity thresholds: Low={THRESH_LOW}%, High={THRESH_HIGH}%")
+    print(f"Spray durations: Low={DUR_LOW}ms, High={DUR_HIGH}ms")
+    print(f"Pi API URL: {PI_API_URL}")
     print("🚀 PC Master Controller ready!")
     
     app.run(
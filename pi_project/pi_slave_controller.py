@@ -4,204 +4,426 @@ Raspberry Pi Slave Controller - Sprinkler Actuator Only
 Listens for commands from PC and controls GPIO for sprinkler
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import RPi.GPIO as GPIO
+import os
+
+# Shared-memory counters: consistent across gunicorn workers, atomic
+# within one (threaded dev server included)
+import stats
+
+try:
+    import orjson  # C-extension JSON: dumps straight to bytes, 3-10x faster
+except ImportError:
+    orjson = None
+
+try:
+    # Typed decode+validate of the command payload in one C call; also
+    # rejects wrong-typed fields (e.g. a string duration) outright
+    import msgspec
+
+    class SprinkleCmd(msgspec.Struct):
+        action: str = "off"
+        duration: int = 0
+except ImportError:
+    msgspec = None
+
+try:
+    # pigpio schedules pin transitions in the DMA engine with µs accuracy,
+    # taking pulse timing off the CPU entirely; needs pigpiod running
+    import pigpio
+    _pig = pigpio.pi()
+    if not _pig.connected:
+        _pig = None
+except ImportError:
+    _pig = None
+import mmap
+import queue
+import struct
+import threading
 import time
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('pi_slave.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging. Request threads only enqueue records; a background
+# QueueListener drains them to the file and console, so no request ever
+# blocks on an SD-card write or terminal flush.
+_log_queue = queue.SimpleQueue()
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_file_handler = logging.FileHandler('pi_slave.log')
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+# Not basicConfig: it would stamp its own format onto the QueueHandler and
+# records would get formatted twice (once into msg, again by the listener)
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.INFO)
+_root_logger.addHandler(QueueHandler(_log_queue))
+_log_listener = QueueListener(_log_queue, _file_handler, _stream_handler)
+_log_listener.start()
 
 # Create Flask app
 app = Flask(__name__)
+# Set at import so /status uptime works under gunicorn too, where the
+# __main__ block never runs
+app.start_time = time.time()
 
 # GPIO Configuration
 GPIO_PIN_SPRINKLER = 17
 GPIO.setmode(GPIO.BCM)
 GPIO.setup(GPIO_PIN_SPRINKLER, GPIO.OUT)
 GPIO.output(GPIO_PIN_SPRINKLER, GPIO.LOW)
+if _pig is not None:
+    _pig.set_mode(GPIO_PIN_SPRINKLER, pigpio.OUTPUT)
+    _pig.write(GPIO_PIN_SPRINKLER, 0)
+
+# Direct register access: with /dev/gpiomem mapped, each pin edge is one
+# 32-bit store into BCM283x GPSET0/GPCLR0 instead of several µs of RPi.GPIO
+# C-glue per call. RPi.GPIO keeps doing direction setup and level reads.
+try:
+    _gpio_mem = mmap.mmap(os.open('/dev/gpiomem', os.O_RDWR | os.O_SYNC), 0xB4)
+    _PIN_MASK = struct.pack('<I', 1 << GPIO_PIN_SPRINKLER)
+
+    def _pin_hi(_mem=_gpio_mem, _mask=_PIN_MASK):
+        _mem[0x1C:0x20] = _mask  # GPSET0
+
+    def _pin_lo(_mem=_gpio_mem, _mask=_PIN_MASK):
+        _mem[0x28:0x2C] = _mask  # GPCLR0
+except (OSError, ValueError):
+    _gpio_mem = None
+
+    def _pin_hi(_out=GPIO.output, _pin=GPIO_PIN_SPRINKLER, _hi=GPIO.HIGH):
+        _out(_pin, _hi)
+
+    def _pin_lo(_out=GPIO.output, _pin=GPIO_PIN_SPRINKLER, _lo=GPIO.LOW):
+        _out(_pin, _lo)
+
+def ojson(obj, status=200):
+    """jsonify replacement: orjson serializes straight to bytes, skipping
+    flask.json's encoder and the str->bytes pass. Timestamps are
+    pre-formatted via now_iso(), so no datetime special-casing is needed.
+    """
+    if orjson is not None:
+        return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+    resp = jsonify(obj)
+    resp.status_code = status
+    return resp
+
+# Response timestamps only need second resolution; cache the ISO string for
+# the current second so pollers hitting /health at high rate don't pay
+# datetime formatting on every request
+_iso_cache = ["", 0]
+
+def now_iso():
+    t = int(time.time())
+    if t != _iso_cache[1]:
+        _iso_cache[:] = [datetime.fromtimestamp(t).isoformat(), t]
+    return _iso_cache[0]
+
+# Spray scheduling: the HIGH edge happens in the request, the LOW edge on a
+# daemon worker thread, so no Flask worker ever sleeps for the spray duration
+_spray_lock = threading.Lock()
+_cancel_event = None
+
+# Debounce: bursty duplicate "on" commands from a misbehaving client get
+# dropped instead of each restarting the pulse
+_last_spray_ts = [0.0]
+_MIN_SPRAY_INTERVAL = 0.050  # seconds
+
+def _precise_sleep(seconds, cancel):
+    """Wait with ~µs accuracy: block on the cancellable event for the bulk,
+    then spin on perf_counter for the last ~2 ms. Plain time.sleep has a
+    60-130 µs floor plus scheduler jitter on the Pi, which matters for
+    short spray pulses. Returns False if the wait was cancelled.
+    """
+    end = time.perf_counter() + seconds
+    if seconds > 0.002 and cancel.wait(seconds - 0.002):
+        return False
+    while time.perf_counter() < end:
+        if cancel.is_set():
+            return False
+    return True
 
-# Statistics
-total_commands = 0
-total_sprays = 0
-total_duration = 0
+# The default-argument bindings below resolve the pin-edge helpers and pin
+# number once at function creation (LOAD_FAST at call time) instead of
+# module attribute lookups per edge on the hot path
+
+def _spray_worker(duration_s, cancel, _off=_pin_lo):
+    """Falling edge of the scheduled pulse; a canceller owns the pin state
+    if it fires first"""
+    if _precise_sleep(duration_s, cancel):
+        _off()
+        logging.info("💧 Sprinkler off (scheduled)")
+
+def _schedule_spray(duration_ms, _on=_pin_hi, _pin=GPIO_PIN_SPRINKLER):
+    """Turn the sprinkler on and arm a worker for the off edge.
+
+    A new command cancels any pending off-worker first, so overlapping
+    requests extend the pulse instead of cutting it short.
+    """
+    global _cancel_event
+    with _spray_lock:
+        if _cancel_event is not None:
+            _cancel_event.set()
+            _cancel_event = None
+        if _pig is not None:
+            # Both edges run as one DMA-scheduled waveform in the pigpio
+            # daemon; no Python timing is involved at all
+            _pig.wave_tx_stop()
+            _pig.wave_clear()
+            _pig.wave_add_generic([
+                pigpio.pulse(1 << _pin, 0, int(duration_ms * 1000)),
+                pigpio.pulse(0, 1 << _pin, 0),
+            ])
+            _pig.wave_send_once(_pig.wave_create())
+            return
+        _on()
+        cancel = threading.Event()
+        threading.Thread(target=_spray_worker, args=(duration_ms / 1000.0, cancel), daemon=True).start()
+        _cancel_event = cancel
+
+def _stop_spray(_off=_pin_lo, _pin=GPIO_PIN_SPRINKLER):
+    """Cancel any pending off-worker and force the sprinkler off now"""
+    global _cancel_event
+    with _spray_lock:
+        if _cancel_event is not None:
+            _cancel_event.set()
+            _cancel_event = None
+        if _pig is not None:
+            _pig.wave_tx_stop()
+            _pig.write(_pin, 0)
+            return
+        _off()
+
+def _do_on(duration):
+    """Handler for action=on: debounce, schedule the pulse, answer 202"""
+    now = time.monotonic()
+    if now - _last_spray_ts[0] < _MIN_SPRAY_INTERVAL:
+        return ojson({
+            "status": "throttled",
+            "message": "Duplicate command within debounce window"
+        }, status=429)
+    _last_spray_ts[0] = now
+
+    logging.info("💧 Activating sprinkler for %sms", duration)
+
+    _schedule_spray(duration)
+
+    stats.inc(stats.total_sprays)
+    stats.inc(stats.total_duration_ms, duration)
+
+    return ojson({
+        "status": "scheduled",
+        "duration": duration,
+        "timestamp": now_iso(),
+        "message": f"Sprinkler activated for {duration}ms"
+    }, status=202)
+
+def _do_off(duration):
+    """Handler for action=off: ensure the sprinkler is idle"""
+    # Common steady-state case: the PC periodically sends "off" while the
+    # plant is healthy. A register read is cheaper than a write, so only
+    # force the pin down when it's HIGH or a pulse is still pending.
+    if _cancel_event is not None or GPIO.input(GPIO_PIN_SPRINKLER):
+        _stop_spray()
+
+    logging.info("🌱 Sprinkler kept off - Plant is healthy")
+
+    return ojson({
+        "status": "off",
+        "duration": 0,
+        "timestamp": now_iso(),
+        "message": "Sprinkler kept off - Plant is healthy"
+    })
+
+# O(1) action dispatch instead of an if/elif chain; new actions just
+# register another handler here
+HANDLERS = {"on": _do_on, "off": _do_off}
 
 @app.route('/sprinkle', methods=['POST'])
 def sprinkle():
     """Main endpoint to receive sprinkler commands from PC"""
-    global total_commands, total_sprays, total_duration
-    
     try:
-        # Get JSON payload from PC
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({
+        # Bail before JSON parsing when no body was posted at all
+        if not request.content_length:
+            return ojson({
                 "status": "error",
                 "message": "No JSON data received"
-            }), 400
-        
-        action = data.get('action', 'off')
-        duration = data.get('duration', 0)
-        
-        logging.info(f"📡 Received command: action={action}, duration={duration}ms")
-        total_commands += 1
-        
-        # Control sprinkler based on action
-        if action == "on" and duration > 0:
-            # Activate sprinkler
-            logging.info(f"💧 Activating sprinkler for {duration}ms")
-            
-            GPIO.output(GPIO_PIN_SPRINKLER, GPIO.HIGH)
-            time.sleep(duration / 1000.0)  # Convert ms to seconds
-            GPIO.output(GPIO_PIN_SPRINKLER, GPIO.LOW)
-            
-            total_sprays += 1
-            total_duration += duration
-            
-            logging.info(f"✅ Sprinkler activated for {duration}ms")
-            
-            return jsonify({
-                "status": "sprinkled",
-                "duration": duration,
-                "timestamp": datetime.now().isoformat(),
-                "message": f"Sprinkler activated for {duration}ms"
-            })
-            
-        elif action == "off":
-            # Ensure sprinkler is off
-            GPIO.output(GPIO_PIN_SPRINKLER, GPIO.LOW)
-            
-            logging.info("🌱 Sprinkler kept off - Plant is healthy")
-            
-            return jsonify({
-                "status": "off",
-                "duration": 0,
-                "timestamp": datetime.now().isoformat(),
-                "message": "Sprinkler kept off - Plant is healthy"
-            })
-            
+            }, status=400)
+
+        if msgspec is not None:
+            # One C-level decode+validate pass, skipping werkzeug's
+            # content-type negotiation entirely
+            try:
+                cmd = msgspec.json.decode(request.get_data(), type=SprinkleCmd)
+            except msgspec.DecodeError as e:
+                return ojson({
+                    "status": "error",
+                    "message": f"Invalid JSON payload: {e}"
+                }, status=400)
+            action = cmd.action
+            duration = cmd.duration
         else:
-            return jsonify({
+            # silent=True turns parse errors into None instead of raising
+            # through werkzeug's error path; cache=True lets any later
+            # get_json() reuse the parsed dict
+            data = request.get_json(silent=True, cache=True)
+
+            if not data:
+                return ojson({
+                    "status": "error",
+                    "message": "No JSON data received"
+                }, status=400)
+
+            action = data.get('action', 'off')
+            duration = data.get('duration', 0)
+        
+        logging.info("📡 Received command: action=%s, duration=%sms", action, duration)
+        stats.inc(stats.total_commands)
+
+        handler = HANDLERS.get(action)
+        if handler is None or (action == "on" and duration <= 0):
+            return ojson({
                 "status": "error",
                 "message": f"Invalid action: {action} or duration: {duration}"
-            }), 400
+            }, status=400)
+
+        return handler(duration)
             
     except Exception as e:
-        logging.error(f"❌ Error in sprinkle endpoint: {e}")
-        return jsonify({
+        logging.error("❌ Error in sprinkle endpoint: %s", e)
+        return ojson({
             "status": "error",
             "message": f"Internal error: {str(e)}"
-        }), 500
+        }, status=500)
+
+# Poll endpoints skip jsonify: the payload scaffold never changes, so it is
+# serialized once at import and only the scalar fields get patched in
+HEALTH_TMPL = (b'{"status":"healthy","timestamp":"%s","gpio_pin":%d,'
+               b'"sprinkler_state":"%s","statistics":{"total_commands":%d,'
+               b'"total_sprays":%d,"total_duration_ms":%d}}')
+STATUS_TMPL = (b'{"status":"ready","timestamp":"%s","gpio_pin":%d,'
+               b'"sprinkler_state":"%s","uptime":%.3f}')
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "gpio_pin": GPIO_PIN_SPRINKLER,
-        "sprinkler_state": "HIGH" if GPIO.input(GPIO_PIN_SPRINKLER) else "LOW",
-        "statistics": {
-            "total_commands": total_commands,
-            "total_sprays": total_sprays,
-            "total_duration_ms": total_duration
-        }
-    })
+    body = HEALTH_TMPL % (
+        now_iso().encode(),
+        GPIO_PIN_SPRINKLER,
+        b"HIGH" if GPIO.input(GPIO_PIN_SPRINKLER) else b"LOW",
+        stats.total_commands.value,
+        stats.total_sprays.value,
+        stats.total_duration_ms.value,
+    )
+    return Response(body, mimetype='application/json')
 
 @app.route('/status', methods=['GET'])
 def status():
     """Get current status"""
-    return jsonify({
-        "status": "ready",
-        "timestamp": datetime.now().isoformat(),
-        "gpio_pin": GPIO_PIN_SPRINKLER,
-        "sprinkler_state": "HIGH" if GPIO.input(GPIO_PIN_SPRINKLER) else "LOW",
-        "uptime": time.time() - getattr(app, 'start_time', time.time())
-    })
+    body = STATUS_TMPL % (
+        now_iso().encode(),
+        GPIO_PIN_SPRINKLER,
+        b"HIGH" if GPIO.input(GPIO_PIN_SPRINKLER) else b"LOW",
+        time.time() - getattr(app, 'start_time', time.time()),
+    )
+    return Response(body, mimetype='application/json')
 
 @app.route('/test', methods=['POST'])
 def test_sprinkler():
     """Test endpoint to manually test sprinkler"""
     try:
-        data = request.get_json() or {}
+        data = (request.get_json(silent=True, cache=True) if request.content_length else None) or {}
         test_duration = data.get('duration', 1000)  # Default 1 second
         
-        logging.info(f"🧪 Testing sprinkler for {test_duration}ms")
-        
-        # Test activation
-        GPIO.output(GPIO_PIN_SPRINKLER, GPIO.HIGH)
-        time.sleep(test_duration / 1000.0)
-        GPIO.output(GPIO_PIN_SPRINKLER, GPIO.LOW)
-        
-        return jsonify({
-            "status": "success",
-            "message": f"Test completed - sprinkler activated for {test_duration}ms",
-            "timestamp": datetime.now().isoformat()
-        })
+        logging.info("🧪 Testing sprinkler for %sms", test_duration)
+
+        # Test activation through the same scheduled-pulse path
+        _schedule_spray(test_duration)
+
+        return ojson({
+            "status": "scheduled",
+            "message": f"Test scheduled - sprinkler activated for {test_duration}ms",
+            "timestamp": now_iso()
+        }, status=202)
         
     except Exception as e:
-        logging.error(f"❌ Test error: {e}")
-        return jsonify({
+        logging.error("❌ Test error: %s", e)
+        return ojson({
             "status": "error",
             "message": f"Test failed: {str(e)}"
-        }), 500
+        }, status=500)
 
 @app.route('/emergency_stop', methods=['POST'])
 def emergency_stop():
     """Emergency stop - turn off sprinkler immediately"""
     try:
-        GPIO.output(GPIO_PIN_SPRINKLER, GPIO.LOW)
+        _stop_spray()
         logging.warning("🚨 EMERGENCY STOP - Sprinkler turned off")
         
-        return jsonify({
+        return ojson({
             "status": "emergency_stop",
             "message": "Sprinkler turned off immediately",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         })
         
     except Exception as e:
-        logging.error(f"❌ Emergency stop error: {e}")
-        return jsonify({
+        logging.error("❌ Emergency stop error: %s", e)
+        return ojson({
             "status": "error",
             "message": f"Emergency stop failed: {str(e)}"
-        }), 500
+        }, status=500)
 
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Get system statistics"""
-    return jsonify({
+    total_sprays = stats.total_sprays.value
+    total_duration = stats.total_duration_ms.value
+    return ojson({
         "statistics": {
-            "total_commands": total_commands,
+            "total_commands": stats.total_commands.value,
             "total_sprays": total_sprays,
             "total_duration_ms": total_duration,
             "average_duration": total_duration / total_sprays if total_sprays > 0 else 0
         },
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     })
 
+def raise_scheduling_priority():
+    """Ask for realtime scheduling so CFS preemption doesn't add jitter to
+    the spray pulse width. SCHED_FIFO needs root or CAP_SYS_NICE; fall
+    back to raising niceness, else keep default scheduling.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(50))
+        logging.info("⏱️ Scheduling policy set to SCHED_FIFO (priority 50)")
+    except (AttributeError, PermissionError, OSError):
+        try:
+            os.nice(-20)
+            logging.info("⏱️ Process niceness raised to -20")
+        except (PermissionError, OSError):
+            logging.info("⏱️ Default scheduling priority (run as root or grant CAP_SYS_NICE to reduce jitter)")
+
+# Runs at import so gunicorn workers get the same treatment as the
+# dev-server __main__ path
+raise_scheduling_priority()
+
 def cleanup():
     """Cleanup GPIO on shutdown"""
     try:
-        GPIO.output(GPIO_PIN_SPRINKLER, GPIO.LOW)
+        _stop_spray()
         GPIO.cleanup()
         logging.info("✅ GPIO cleanup completed")
     except Exception as e:
-        logging.error(f"❌ GPIO cleanup error: {e}")
+        logging.error("❌ GPIO cleanup error: %s", e)
+    finally:
+        # Flush queued records through the file/console handlers
+        _log_listener.stop()
 
 if __name__ == '__main__':
-    app.start_time = time.time()
-    
     logging.info("🌱 Raspberry Pi Slave Controller Starting...")
-    logging.info(f"💧 Sprinkler GPIO Pin: {GPIO_PIN_SPRINKLER}")
+    logging.info("💧 Sprinkler GPIO Pin: %s", GPIO_PIN_SPRINKLER)
     logging.info("📡 Listening for commands from PC Master Controller")
     logging.info("🚀 Pi Slave Controller ready!")
     
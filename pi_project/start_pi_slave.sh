@@ -39,5 +39,16 @@ echo ""
 echo "Press Ctrl+C to stop the server"
 echo "=================================================================="
 
-# Start the server
-python pi_slave_controller.py
+# Start the server: gunicorn with a gevent worker handles concurrent
+# sprinkler + health-check traffic far better than Werkzeug's dev server;
+# fall back to the dev server if gunicorn isn't installed
+if command -v gunicorn &> /dev/null; then
+    # No --preload: importing the app in the master would strand the
+    # QueueListener logging thread there (threads don't survive fork) and
+    # break gevent monkey-patching. With -w 1 the lone worker creates the
+    # shared-memory stats itself, so /stats stays consistent anyway.
+    gunicorn -k gevent -w 1 --worker-connections 200 -b 0.0.0.0:5001 pi_slave_controller:app
+else
+    echo "⚠️  gunicorn not found, falling back to Flask dev server"
+    python pi_slave_controller.py
+fi
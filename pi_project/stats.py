@@ -0,0 +1,20 @@
+"""
+Shared-memory request statistics for the Pi Slave Controller
+
+multiprocessing.Value slots live in shared memory created at import.
+Under the single-worker gunicorn deployment the worker imports this
+itself; scaling past -w 1 requires creating the slots before fork (a
+post_fork/when_ready hook, not --preload, which would also strand the
+logging QueueListener thread in the master).
+"""
+
+import multiprocessing
+
+total_commands = multiprocessing.Value('Q', 0)
+total_sprays = multiprocessing.Value('Q', 0)
+total_duration_ms = multiprocessing.Value('Q', 0)
+
+def inc(counter, amount=1):
+    """Atomically add to a shared counter"""
+    with counter.get_lock():
+        counter.value += amount